@@ -1,25 +1,141 @@
 import serial
 import time
+import logging
+import math
 import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-from collections import deque
-from datetime import datetime, timedelta
 import numpy as np
-import math
+try:
+    from numba import njit
+except ImportError:
+    # Numba is optional; without it the kernels below run as plain Python
+    def njit(**kwargs):
+        return lambda func: func
 from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QComboBox, QHBoxLayout
-from PyQt5.QtCore import QTimer
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
 import sys
 
+logger = logging.getLogger(__name__)
+
+# Tick spacings for the time axis, in seconds
+TICK_STEPS = (1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200)
+
+# Columns of the sample ring buffer
+COL_TS, COL_T, COL_TA, COL_RH, COL_AH, COL_DP = range(6)
+NUM_COLS = 6
+
+# The time axis is plotted in plain Unix seconds; ticks are placed on round
+# wall-clock times and labelled with time.strftime
+
+def time_ticks(start, end, max_ticks=5):
+    step = next((s for s in TICK_STEPS if (end - start) / s <= max_ticks), TICK_STEPS[-1])
+    offset = time.localtime(start).tm_gmtoff
+    first = np.ceil((start + offset) / step) * step - offset
+    return np.arange(first, end, step)
+
+def format_time(x, pos=None):
+    return time.strftime('%H:%M:%S', time.localtime(x))
+
+# Both formulas work element-wise on NumPy arrays as well as on scalars
+
 def calculate_dew_point(temp, rh):
     a = 17.27
     b = 237.7
-    alpha = ((a * temp) / (b + temp)) + math.log(rh/100.0)
+    alpha = ((a * temp) / (b + temp)) + np.log(rh / 100.0)
     return (b * alpha) / (a - alpha)
 
 def calculate_absolute_humidity(temp, rh):
-    return (6.112 * math.exp((17.67 * temp) / (temp + 243.5)) * rh * 2.1674) / (273.15 + temp)
+    # 6.112 hPa * 2.1674 folded into a single constant
+    return (13.2471488 * np.exp((17.67 * temp) / (temp + 243.5)) * rh) / (273.15 + temp)
+
+@njit(cache=True)
+def rolling_average(ts, temps, out, start, tail, window_sum, window):
+    # Running-sum moving average over (ts[i] - window, ts[i]] for every sample
+    # from index start on. tail is the oldest sample still inside the window;
+    # the updated tail and sum are returned for the next batch.
+    for i in range(start, len(ts)):
+        window_sum += temps[i]
+        while ts[tail] <= ts[i] - window:
+            window_sum -= temps[tail]
+            tail += 1
+        out[i - start] = window_sum / (i - tail + 1)
+    return tail, window_sum
+
+def min_max_decimate(y, edges, empty):
+    # Interleave the min and max of every bucket so the decimated line still
+    # spans the full vertical extent of the data in each pixel column; empty
+    # buckets become NaN and are not drawn
+    full = ~empty
+    out = np.full(2 * len(edges), np.nan)
+    out[0::2][full] = np.minimum.reduceat(y, edges[full])
+    out[1::2][full] = np.maximum.reduceat(y, edges[full])
+    return out
+
+class SerialReader(QThread):
+    # Emitted once per parsed line: arrival time (Unix seconds), temperature, RH
+    new_sample = pyqtSignal(float, float, float)
+
+    def __init__(self, port, baudrate):
+        super().__init__()
+        self.port = port
+        self.baudrate = baudrate
+        self.running = True
+
+    def run(self):
+        ser = serial.Serial(self.port, self.baudrate, timeout=0.1)
+        buffer = None  # The port may open mid-line; None until resynced
+        # Bound methods looked up once instead of on every line
+        emit = self.new_sample.emit
+        read = ser.read
+        clock = time.time
+        try:
+            while self.running:
+                # Wait for the first byte (up to the timeout), then drain
+                # whatever else is already buffered; an incomplete trailing
+                # line is kept for the next read
+                data = read(max(1, ser.in_waiting))
+                if not data:
+                    continue
+                if buffer is None:
+                    # Drop everything up to the first line break
+                    newline = data.find(b'\n')
+                    if newline < 0:
+                        continue
+                    buffer, data = b'', data[newline + 1:]
+                *lines, buffer = (buffer + data).split(b'\n')
+
+                now = clock()
+                for line in lines:
+                    # Lines are either "temp,rh" or the older
+                    # "timestamp,temp,rh,x"; only temperature and humidity
+                    # are parsed, straight from the bytes, and malformed
+                    # lines are skipped
+                    try:
+                        c1 = line.index(b',')
+                        c2 = line.find(b',', c1 + 1)
+                        if c2 < 0:
+                            temp = float(line[:c1])
+                            rh = float(line[c1 + 1:])
+                        else:
+                            c3 = line.index(b',', c2 + 1)
+                            if line.find(b',', c3 + 1) >= 0:
+                                continue
+                            temp = float(line[c1 + 1:c2])
+                            rh = float(line[c2 + 1:c3])
+                    except ValueError:
+                        continue
+                    # Sensors report failed reads as "nan"; float() accepts
+                    # that, so non-finite values are rejected explicitly, as
+                    # is RH <= 0, for which the dew point is undefined
+                    if math.isfinite(temp) and math.isfinite(rh) and rh > 0:
+                        emit(now, temp, rh)
+        finally:
+            ser.close()
+
+    def stop(self):
+        self.running = False
+        self.wait()
 
 class InteractivePlot(QMainWindow):
     def __init__(self):
@@ -44,10 +160,17 @@ class InteractivePlot(QMainWindow):
         self.canvas = FigureCanvas(self.fig)
         main_layout.addWidget(self.canvas)
 
-        self.ax1 = self.fig.add_subplot(411)
-        self.ax2 = self.fig.add_subplot(412)
-        self.ax3 = self.fig.add_subplot(413)
-        self.ax4 = self.fig.add_subplot(414)
+        # Fixed subplot positions instead of tight_layout, so label and tick
+        # changes never trigger a layout solve and the axes bboxes (and the
+        # cached blit backgrounds) stay put
+        self.fig.set_layout_engine(None)
+        gs = self.fig.add_gridspec(4, 1, left=0.08, right=0.98, top=0.97, bottom=0.06, hspace=0.1)
+        self.ax1 = self.fig.add_subplot(gs[0, 0])
+        # All plots share ax1's time axis, so one set_xlim moves all four
+        self.ax2 = self.fig.add_subplot(gs[1, 0], sharex=self.ax1)
+        self.ax3 = self.fig.add_subplot(gs[2, 0], sharex=self.ax1)
+        self.ax4 = self.fig.add_subplot(gs[3, 0], sharex=self.ax1)
+        self.axes = (self.ax1, self.ax2, self.ax3, self.ax4)
 
         self.temp_line, = self.ax1.plot([], [], 'r-', label='Temperature')
         self.temp_avg_line, = self.ax1.plot([], [], 'b-', label='20s Moving Avg')
@@ -55,148 +178,277 @@ class InteractivePlot(QMainWindow):
         self.ah_line, = self.ax3.plot([], [], 'g-', label='Absolute Humidity')
         self.dp_line, = self.ax4.plot([], [], 'm-', label='Dew Point')
 
+        # Lines are animated: they are left out of full redraws and blitted
+        # on top of the cached axes backgrounds instead
+        for ax in self.axes:
+            for line in ax.lines:
+                line.set_animated(True)
+
         self.ax1.set_ylabel('Temperature (°C)')
         self.ax2.set_ylabel('Relative Humidity (%)')
         self.ax3.set_ylabel('Absolute Humidity (g/m³)')
         self.ax4.set_ylabel('Dew Point (°C)')
         self.ax4.set_xlabel('Time')
 
-        for ax in (self.ax1, self.ax2, self.ax3, self.ax4):
+        for ax in self.axes:
             ax.legend()
             ax.grid(True)
 
-        date_formatter = mdates.DateFormatter('%H:%M:%S')
-        for ax in (self.ax1, self.ax2, self.ax3, self.ax4):
-            ax.xaxis.set_major_formatter(date_formatter)
+        self.ax1.xaxis.set_major_formatter(format_time)
+        for ax in (self.ax1, self.ax2, self.ax3):
+            ax.tick_params(labelbottom=False)
 
-        self.fig.tight_layout()
+        # Re-capture the axes backgrounds after every full redraw (including
+        # the ones triggered by resizing the window)
+        self.backgrounds = None
+        self.redraw_pending = False
+        self.needs_rescale = False
+        self.canvas.mpl_connect('draw_event', self.on_draw)
 
-        # Initialize data structures
+        # Initialize data structures: a fixed-size ring buffer with one row
+        # per sample and one column per series (see COL_*), timestamps are
+        # Unix seconds. Every sample is written twice, at head and
+        # head + max_points, so the last max_points samples are always
+        # available as one contiguous slice.
         self.max_points = 4 * 60 * 60  # 4 hours of data
-        self.timestamps = deque(maxlen=self.max_points)
-        self.temperatures = deque(maxlen=self.max_points)
-        self.temp_avg = deque(maxlen=self.max_points)
-        self.rel_humidities = deque(maxlen=self.max_points)
-        self.abs_humidities = deque(maxlen=self.max_points)
-        self.dew_points = deque(maxlen=self.max_points)
-
-        # Connect to serial port
-        self.ser = serial.Serial('/dev/ttyACM1', 9600)
-        
-        # Start updating plot
-        self.start_time = None
+        self.data = np.empty((2 * self.max_points, NUM_COLS))
+        self.head = 0  # next row to write
+        self.count = 0  # number of valid samples
+        self.column_grid = None  # (x_start, x_end, pixels) of the decimation columns
+        self.series = ((self.temp_line, COL_T), (self.temp_avg_line, COL_TA),
+                       (self.rh_line, COL_RH), (self.ah_line, COL_AH), (self.dp_line, COL_DP))
+
+        # Number of newest samples inside the moving-average window and
+        # their running sum
+        self.window_len = 0
+        self.window_sum = 0.0
+
+        # Plot refreshes are event driven: the first sample after a refresh
+        # arms a single-shot timer, so the plot is redrawn at most every
+        # 200 ms while data arrives and the timer never fires when idle
         self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(200)
         self.timer.timeout.connect(self.update_plot)
-        self.timer.start(100)  # Update every 100 ms
 
-        self.time_range = timedelta(hours=4)  # Default time range
+        # Read the serial port on a worker thread; samples are queued here
+        # until the next plot refresh
+        self.pending = []
+        self.reader = SerialReader('/dev/ttyACM1', 9600)
+        self.reader.new_sample.connect(self.on_sample, Qt.QueuedConnection)
+        self.reader.start()
+
+        self.time_range = 4 * 60 * 60  # Default time range in seconds
+        self.x_start = None  # Edges of the time axis, Unix seconds
+        self.x_end = None
+
+    def on_sample(self, ts, temp, rh):
+        self.pending.append((ts, temp, rh))
+        if not self.timer.isActive():
+            self.timer.start()
 
     def update_plot(self):
-        if self.ser.in_waiting > 0:
-            line = self.ser.readline().decode('utf-8').strip()
-            parts = line.split(',')
-            
-            if len(parts) == 4:
-                timestamp, temp, rh, _ = parts
-                temp = float(temp)
-                rh = float(rh)
-                
-                current_time = datetime.now()
-                if self.start_time is None:
-                    self.start_time = current_time
-                
-                ah = calculate_absolute_humidity(temp, rh)
-                dp = calculate_dew_point(temp, rh)
-                
-                self.timestamps.append(current_time)
-                self.temperatures.append(temp)
-                self.rel_humidities.append(rh)
-                self.abs_humidities.append(ah)
-                self.dew_points.append(dp)
-                
-                # Calculate 20-second moving average
-                twenty_sec_ago = current_time - timedelta(seconds=20)
-                recent_temps = [t for t, ts in zip(self.temperatures, self.timestamps) if ts > twenty_sec_ago]
-                if recent_temps:
-                    avg_temp = sum(recent_temps) / len(recent_temps)
-                    self.temp_avg.append(avg_temp)
-                else:
-                    self.temp_avg.append(temp)  # If not enough data, use current temp
-                
-                self.temp_line.set_data(self.timestamps, self.temperatures)
-                self.temp_avg_line.set_data(self.timestamps, self.temp_avg)
-                self.rh_line.set_data(self.timestamps, self.rel_humidities)
-                self.ah_line.set_data(self.timestamps, self.abs_humidities)
-                self.dp_line.set_data(self.timestamps, self.dew_points)
-                
-                self.adjust_y_axis_ranges()
-                
-                for ax in (self.ax1, self.ax2, self.ax3, self.ax4):
-                    ax.set_xlim(current_time - self.time_range, current_time)
-                
-                self.fig.canvas.draw()
-                
-                print(f"Time: {current_time.strftime('%H:%M:%S')}")
-                print(f"Temperature: {temp:.2f}°C")
-                print(f"20s Avg Temperature: {self.temp_avg[-1]:.2f}°C")
-                print(f"Relative Humidity: {rh:.2f}%")
-                print(f"Absolute Humidity: {ah:.2f} g/m³")
-                print(f"Dew Point: {dp:.2f}°C")
-                print("-" * 30)
-
-    def adjust_y_axis_ranges(self):
-        current_time = datetime.now()
-        start_time = current_time - self.time_range
-
-        # Filter data for the current time range
-        visible_timestamps = [t for t in self.timestamps if t >= start_time]
-        visible_temps = [t for t, ts in zip(self.temperatures, self.timestamps) if ts >= start_time]
-        visible_temp_avgs = [t for t, ts in zip(self.temp_avg, self.timestamps) if ts >= start_time]
-        visible_rhs = [rh for rh, ts in zip(self.rel_humidities, self.timestamps) if ts >= start_time]
-        visible_ahs = [ah for ah, ts in zip(self.abs_humidities, self.timestamps) if ts >= start_time]
-        visible_dps = [dp for dp, ts in zip(self.dew_points, self.timestamps) if ts >= start_time]
+        n = 0
+        if self.pending:
+            ts, temps, rhs = np.array(self.pending).T
+            self.pending = []
+            n = self.append_samples(ts, temps, rhs)
+        if n == 0 and not self.needs_rescale:
+            return
+
+        end = self.head + self.max_points
+        current_time = self.data[end - 1, COL_TS]
+
+        # Only redraw everything when the time axis has to move or a new
+        # value falls outside the current y limits; otherwise just blit the
+        # new line data. The check always runs, but while a full redraw is
+        # queued the rescale is deferred: on_draw re-arms the refresh timer
+        # so it is applied once that draw has finished.
+        if (self.backgrounds is None or self.x_end is None or current_time > self.x_end
+                or (n and self.outside_y_range(slice(end - n, end)))):
+            self.needs_rescale = True
+        full_redraw = self.needs_rescale and not self.redraw_pending
+        if full_redraw:
+            self.needs_rescale = False
+            self.adjust_y_axis_ranges(current_time)
+            self.update_x_range(current_time)
+
+        self.update_lines()
+
+        if full_redraw:
+            self.request_redraw()
+        elif not self.redraw_pending:
+            self.blit_lines()
+
+        if n:
+            latest = self.data[end - 1]
+            logger.debug("T=%.2f°C avg=%.2f°C RH=%.2f%% AH=%.2f g/m³ DP=%.2f°C",
+                         latest[COL_T], latest[COL_TA], latest[COL_RH], latest[COL_AH], latest[COL_DP])
+
+    def append_samples(self, ts, temps, rhs):
+        rows = np.empty((len(temps), NUM_COLS))
+        rows[:, COL_TS] = ts
+        rows[:, COL_T] = temps
+        rows[:, COL_RH] = rhs
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rows[:, COL_AH] = calculate_absolute_humidity(temps, rhs)
+            rows[:, COL_DP] = calculate_dew_point(temps, rhs)
+
+        # Drop readings the formulas are undefined for (e.g. RH <= 0 gives a
+        # NaN dew point), which would otherwise break the axis limits
+        rows = rows[np.isfinite(rows[:, [COL_AH, COL_DP]]).all(axis=1)]
+        n = len(rows)
+        if n == 0:
+            return 0
+
+        idx = (self.head + np.arange(n)) % self.max_points
+        self.data[idx] = rows
+        self.data[idx + self.max_points] = rows
+        self.head = (self.head + n) % self.max_points
+        self.count = min(self.count + n, self.max_points)
+
+        # Update 20-second moving average
+        temp_avgs = np.empty(n)
+        start = self.count - n
+        history = self.ordered()
+        tail, self.window_sum = rolling_average(history[:, COL_TS], history[:, COL_T], temp_avgs,
+                                                start, start - self.window_len, self.window_sum, 20.0)
+        self.window_len = self.count - tail
+        self.data[idx, COL_TA] = temp_avgs
+        self.data[idx + self.max_points, COL_TA] = temp_avgs
+        return n
+
+    def update_lines(self):
+        if self.count == 0 or self.x_start is None:
+            return
+
+        # Only hand the samples inside the visible time range to matplotlib
+        history = self.ordered()
+        visible = history[np.searchsorted(history[:, COL_TS], self.x_start):]
+        values = [visible[:, col] for _, col in self.series]
+
+        # Few enough samples: plot them as they are
+        n_px = int(self.ax1.bbox.width)
+        if len(visible) <= 2 * n_px:
+            self.column_grid = None
+            times = visible[:, COL_TS]
+            for (line, _), y in zip(self.series, values):
+                line.set_data(times, y)
+            return
+
+        # Otherwise draw the min and max of each pixel column of the time
+        # axis. The column positions only change when the axis moves or is
+        # resized, so in between only the y data of the lines is replaced.
+        grid = (self.x_start, self.x_end, n_px)
+        if grid != self.column_grid:
+            self.column_grid = grid
+            self.column_starts = np.linspace(self.x_start, self.x_end, n_px, endpoint=False)
+            self.column_x = np.repeat(self.column_starts, 2)
+            for line, _ in self.series:
+                line.set_xdata(self.column_x)
+
+        edges = np.searchsorted(visible[:, COL_TS], self.column_starts)
+        empty = np.diff(edges, append=len(visible)) == 0
+        for (line, _), y in zip(self.series, values):
+            line.set_ydata(min_max_decimate(y, edges, empty))
+
+    def request_redraw(self):
+        # Let Qt coalesce pending redraws into a single paint
+        self.redraw_pending = True
+        self.canvas.draw_idle()
+
+    def on_draw(self, event):
+        self.redraw_pending = False
+        if self.needs_rescale and not self.timer.isActive():
+            self.timer.start()
+        self.backgrounds = [self.canvas.copy_from_bbox(ax.bbox) for ax in self.axes]
+        for ax in self.axes:
+            for line in ax.lines:
+                ax.draw_artist(line)
+
+    def blit_lines(self):
+        for ax, background in zip(self.axes, self.backgrounds):
+            self.canvas.restore_region(background)
+            for line in ax.lines:
+                ax.draw_artist(line)
+            self.canvas.blit(ax.bbox)
+
+    def ordered(self):
+        """Return a view of the valid rows of the ring buffer, oldest first."""
+        end = self.head + self.max_points
+        return self.data[end - self.count:end]
+
+    def adjust_y_axis_ranges(self, current_time):
+        if self.count == 0:
+            return
+
+        cutoff = current_time - self.time_range
+
+        # Find the first sample inside the current time range once, then
+        # reduce the same contiguous slice of every series
+        end = self.head + self.max_points
+        start = end - self.count + np.searchsorted(self.ordered()[:, COL_TS], cutoff)
+        if start == end:
+            return
+        visible = self.data[start:end]
+        y_min = visible.min(axis=0)
+        y_max = visible.max(axis=0)
 
         # Adjust y-axis ranges
-        if visible_temps:
-            temp_min = min(min(visible_temps), min(visible_temp_avgs))
-            temp_max = max(max(visible_temps), max(visible_temp_avgs))
-            self.ax1.set_ylim(temp_min - 1, temp_max + 1)
+        temp_min = min(y_min[COL_T], y_min[COL_TA])
+        temp_max = max(y_max[COL_T], y_max[COL_TA])
+        self.ax1.set_ylim(temp_min - 1, temp_max + 1)
 
-        if visible_rhs:
-            rh_min, rh_max = min(visible_rhs), max(visible_rhs)
-            self.ax2.set_ylim(max(0, rh_min - 5), min(100, rh_max + 5))
+        self.ax2.set_ylim(max(0, y_min[COL_RH] - 5), min(100, y_max[COL_RH] + 5))
+        self.ax3.set_ylim(y_min[COL_AH] - 0.5, y_max[COL_AH] + 0.5)
+        self.ax4.set_ylim(y_min[COL_DP] - 1, y_max[COL_DP] + 1)
 
-        if visible_ahs:
-            ah_min, ah_max = min(visible_ahs), max(visible_ahs)
-            self.ax3.set_ylim(ah_min - 0.5, ah_max + 0.5)
+    def outside_y_range(self, new):
+        # Hysteresis: a new value has to get within half the axis padding of
+        # a limit before the y ranges are recomputed
+        new_min = self.data[new].min(axis=0)
+        new_max = self.data[new].max(axis=0)
+        for ax, col, margin in ((self.ax1, COL_T, 0.5), (self.ax1, COL_TA, 0.5),
+                                (self.ax3, COL_AH, 0.25), (self.ax4, COL_DP, 0.5)):
+            y_min, y_max = ax.get_ylim()
+            if new_min[col] < y_min + margin or new_max[col] > y_max - margin:
+                return True
 
-        if visible_dps:
-            dp_min, dp_max = min(visible_dps), max(visible_dps)
-            self.ax4.set_ylim(dp_min - 1, dp_max + 1)
+        # Relative humidity limits are clamped to 0..100 %
+        rh_min, rh_max = self.ax2.get_ylim()
+        return ((new_min[COL_RH] < rh_min + 2.5 and rh_min > 0)
+                or (new_max[COL_RH] > rh_max - 2.5 and rh_max < 100))
+
+    def update_x_range(self, current_time):
+        # Leave some room on the right so the time axis only has to move
+        # once the newest sample reaches the edge
+        self.x_start = current_time - self.time_range
+        self.x_end = current_time + self.time_range / 20
+        self.ax1.set_xlim(self.x_start, self.x_end)
+        self.ax1.set_xticks(time_ticks(self.x_start, self.x_end))
 
     def update_time_range(self, index):
         if index == 0:
-            self.time_range = timedelta(minutes=1)
+            self.time_range = 60
         elif index == 1:
-            self.time_range = timedelta(minutes=5)
+            self.time_range = 5 * 60
         elif index == 2:
-            self.time_range = timedelta(minutes=20)
+            self.time_range = 20 * 60
         elif index == 3:
-            self.time_range = timedelta(hours=1)
+            self.time_range = 60 * 60
         else:
-            self.time_range = timedelta(hours=4)
+            self.time_range = 4 * 60 * 60
         
         # Update the plot with the new time range
-        current_time = datetime.now()
-        for ax in (self.ax1, self.ax2, self.ax3, self.ax4):
-            ax.set_xlim(current_time - self.time_range, current_time)
-        
-        self.adjust_y_axis_ranges()
-        self.canvas.draw()
+        current_time = time.time()
+        self.update_x_range(current_time)
+        self.adjust_y_axis_ranges(current_time)
+        self.update_lines()
+        self.request_redraw()
 
     def closeEvent(self, event):
         self.timer.stop()
-        self.ser.close()
+        self.reader.stop()
         event.accept()
 
 if __name__ == '__main__':